@@ -1,7 +1,9 @@
+import asyncio
+import atexit
 import os
+import secrets
 import sqlite3
-import uuid
-from datetime import datetime
+import threading
 from telegram import Update
 from telegram.ext import (
     ApplicationBuilder,
@@ -11,10 +13,21 @@ from telegram.ext import (
 
 # --- Database Setup ---
 DB_PATH = "bot.db"
-OWNER_ID = int(os.environ.get("OWNER_ID", "123456789"))  # your ID or set in Railway vars
+OWNER_ID = int(os.environ["OWNER_ID"]) if os.environ.get("OWNER_ID") else None  # set in Railway vars
 
 conn = sqlite3.connect(DB_PATH, check_same_thread=False)
 cur = conn.cursor()
+atexit.register(conn.close)
+# Handlers run DB work in worker threads; serialize access to the shared cursor
+db_lock = threading.Lock()
+
+# Only takes effect on a fresh database, so it must run before anything is created
+cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+# WAL lets reads run alongside writes and needs far fewer fsyncs per commit
+cur.execute("PRAGMA journal_mode=WAL")
+cur.execute("PRAGMA synchronous=NORMAL")
+cur.execute("PRAGMA temp_store=MEMORY")
+cur.execute("PRAGMA mmap_size=134217728")
 
 cur.execute("""
 CREATE TABLE IF NOT EXISTS links (
@@ -25,32 +38,57 @@ CREATE TABLE IF NOT EXISTS links (
     used_at TEXT
 )
 """)
+# token already has an implicit index from UNIQUE; /stats aggregates on used
+cur.execute("CREATE INDEX IF NOT EXISTS idx_links_used ON links (used)")
 conn.commit()
 
+# Links only change through create_links()/reset_links(), so keep every
+# issued token in memory and reject unknown /start payloads without a query
+known_tokens = {row[0] for row in cur.execute("SELECT token FROM links")}
+
 
 # --- Helper Functions ---
 def create_links(count=10):
-    links = []
-    for _ in range(count):
-        token = str(uuid.uuid4())[:8]
-        cur.execute("INSERT OR IGNORE INTO links (token) VALUES (?)", (token,))
-        links.append(token)
-    conn.commit()
+    links = [secrets.token_urlsafe(9) for _ in range(count)]
+    with db_lock:
+        with conn:
+            cur.executemany("INSERT OR IGNORE INTO links (token) VALUES (?)",
+                            [(token,) for token in links])
+        known_tokens.update(links)
     return links
 
 
 def mark_link_used(token, user_id):
-    cur.execute("SELECT used FROM links WHERE token=?", (token,))
-    row = cur.fetchone()
-    if not row:
+    if token not in known_tokens:
         return "❌ Invalid link."
-    if row[0] == 1:
-        return "⚠️ This link has already been used."
 
-    cur.execute("UPDATE links SET used=1, used_by=?, used_at=? WHERE token=?",
-                (user_id, datetime.now().isoformat(), token))
-    conn.commit()
-    return "✅ Link verified successfully!"
+    with db_lock:
+        # Claim the link in one statement; a miss means it was already used
+        with conn:
+            cur.execute("UPDATE links SET used=1, used_by=?, "
+                        "used_at=strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime') "
+                        "WHERE token=? AND used=0",
+                        (user_id, token))
+        if cur.rowcount == 1:
+            return "✅ Link verified successfully!"
+    return "⚠️ This link has already been used."
+
+
+def link_stats():
+    with db_lock:
+        cur.execute("SELECT COUNT(*) FILTER (WHERE used=1), "
+                    "COUNT(*) FILTER (WHERE used=0) FROM links")
+        used, unused = cur.fetchone()
+    return used, unused
+
+
+def reset_links():
+    with db_lock:
+        with conn:
+            cur.execute("DELETE FROM links")
+        known_tokens.clear()
+        # executescript steps the pragma to completion; execute() frees one page
+        cur.executescript("PRAGMA incremental_vacuum;")
 
 
 # --- Command Handlers ---
@@ -59,7 +97,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     args = context.args
     if args:
         token = args[0]
-        msg = mark_link_used(token, user.id)
+        msg = await asyncio.to_thread(mark_link_used, token, user.id)
         await update.message.reply_text(msg)
     else:
         await update.message.reply_text("👋 Welcome! Use a deep link to verify.")
@@ -70,9 +108,9 @@ async def generate(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ You are not authorized.")
         return
 
-    links = create_links()
+    links = await asyncio.to_thread(create_links)
     base = f"https://t.me/{context.bot.username}?start="
-    text = "\n".join([base + token for token in links])
+    text = "\n".join(base + token for token in links)
     await update.message.reply_text(f"✅ Generated links:\n\n{text}")
 
 
@@ -81,11 +119,7 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ You are not authorized.")
         return
 
-    cur.execute("SELECT COUNT(*) FROM links WHERE used=1")
-    used = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM links WHERE used=0")
-    unused = cur.fetchone()[0]
-
+    used, unused = await asyncio.to_thread(link_stats)
     await update.message.reply_text(f"📊 Stats:\nUsed: {used}\nUnused: {unused}")
 
 
@@ -94,8 +128,7 @@ async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ You are not authorized.")
         return
 
-    cur.execute("DELETE FROM links")
-    conn.commit()
+    await asyncio.to_thread(reset_links)
     await update.message.reply_text("♻️ Database reset complete!")
 
 
@@ -105,6 +138,9 @@ def main():
     if not token:
         print("❌ BOT_TOKEN not found in environment variables.")
         return
+    if OWNER_ID is None:
+        print("❌ OWNER_ID not found in environment variables.")
+        return
 
     app = ApplicationBuilder().token(token).build()
     app.add_handler(CommandHandler("start", start))